@@ -1,8 +1,12 @@
 import datetime
+import os
 
 class Logger:
     def __init__(self, level="debug"):
-        self.filename = f"test/logs/log_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.txt"
+        # Tagged with the test module so tests running side by side (make -j test) don't share a file
+        module = os.environ.get("COCOTB_TEST_MODULES", "").rsplit(".", 1)[-1]
+        suffix = f"_{module}" if module else ""
+        self.filename = f"test/logs/log_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}{suffix}.txt"
         self.level = level
 
     def debug(self, *messages):
@@ -1,4 +1,7 @@
-from typing import List
+from array import array
+from typing import Sequence
+import cocotb
+from cocotb.triggers import ClockCycles, Combine, First, ValueChange
 from .logger import logger
 
 class Memory:
@@ -6,10 +9,18 @@ class Memory:
         self.dut = dut
         self.addr_bits = addr_bits
         self.data_bits = data_bits
-        self.memory = [0] * (2**addr_bits)
+        # Packed backing store, one machine word per row instead of a list of int objects
+        typecode = "B" if data_bits <= 8 else "H" if data_bits <= 16 else "L"
+        self.memory = array(typecode, [0]) * (2**addr_bits)
         self.channels = channels
         self.name = name
 
+        # Per-channel lane offsets into the packed port vectors
+        self.addr_mask = (1 << addr_bits) - 1
+        self.data_mask = (1 << data_bits) - 1
+        self.addr_shifts = tuple(c * addr_bits for c in range(channels))
+        self.data_shifts = tuple(c * data_bits for c in range(channels))
+
         self.mem_read_valid = getattr(dut, f"{name}_mem_read_valid")
         self.mem_read_address = getattr(dut, f"{name}_mem_read_address")
         self.mem_read_ready = getattr(dut, f"{name}_mem_read_ready")
@@ -21,60 +32,92 @@ class Memory:
             self.mem_write_data = getattr(dut, f"{name}_mem_write_data")
             self.mem_write_ready = getattr(dut, f"{name}_mem_write_ready")
 
-    def run(self):
-        mem_read_valid = [
-            int(str(self.mem_read_valid.value)[i:i+1], 2)
-            for i in range(0, len(str(self.mem_read_valid.value)), 1)
-        ]
-
-        mem_read_address = [
-            int(str(self.mem_read_address.value)[i:i+self.addr_bits], 2)
-            for i in range(0, len(str(self.mem_read_address.value)), self.addr_bits)
-        ]
-        mem_read_ready = [0] * self.channels
-        mem_read_data = [0] * self.channels
-
-        for i in range(self.channels):
-            if mem_read_valid[i] == 1:
-                mem_read_data[i] = self.memory[mem_read_address[i]]
-                mem_read_ready[i] = 1
-            else:
-                mem_read_ready[i] = 0
-
-        self.mem_read_data.value = int(''.join(format(d, '0' + str(self.data_bits) + 'b') for d in mem_read_data), 2)
-        self.mem_read_ready.value = int(''.join(format(r, '01b') for r in mem_read_ready), 2)
+    def pending(self) -> int:
+        # Bitmask of the channels with a read or write request raised
+        valid = int(self.mem_read_valid.value)
+        if self.name != "program":
+            valid |= int(self.mem_write_valid.value)
+        return valid
+
+    async def driver(self, clk, latency: int = 1):
+        # Event-driven memory model, meant to be forked with cocotb.start_soon
+        # > Every channel is served by its own task, so each request is timed from the cycle it
+        #   arrives, independently of what the other channels are doing
+        # > Cancelling the driver cancels the channel tasks as well
+        self.read_ready = 0
+        self.read_data = 0
+        self.write_ready = 0
+        self.drive()
 
+        channels = [cocotb.start_soon(self.serve(c, clk, latency)) for c in range(self.channels)]
+        try:
+            await Combine(*channels)
+        finally:
+            for channel in channels:
+                channel.cancel()
+
+    async def serve(self, c: int, clk, latency: int):
+        # The response is sampled by the controller on the `latency`-th clock edge after the request
+        # is raised, and ready is held only until the controller takes it (it drops valid on that
+        # edge), so a later request on this channel never sees a stale ready or stale data
+        bit = 1 << c
+        requests = [ValueChange(self.mem_read_valid)]
         if self.name != "program":
-            mem_write_valid = [
-                int(str(self.mem_write_valid.value)[i:i+1], 2)
-                for i in range(0, len(str(self.mem_write_valid.value)), 1)
-            ]
-            mem_write_address = [
-                int(str(self.mem_write_address.value)[i:i+self.addr_bits], 2)
-                for i in range(0, len(str(self.mem_write_address.value)), self.addr_bits)
-            ]
-            mem_write_data = [
-                int(str(self.mem_write_data.value)[i:i+self.data_bits], 2)
-                for i in range(0, len(str(self.mem_write_data.value)), self.data_bits)
-            ]
-            mem_write_ready = [0] * self.channels
-
-            for i in range(self.channels):
-                if mem_write_valid[i] == 1:
-                    self.memory[mem_write_address[i]] = mem_write_data[i]
-                    mem_write_ready[i] = 1
-                else:
-                    mem_write_ready[i] = 0
+            requests.append(ValueChange(self.mem_write_valid))
+
+        while True:
+            while not self.pending() & bit:
+                await First(*requests)
+            if latency > 1:
+                await ClockCycles(clk, latency - 1)
+            self.respond(c)
 
-            self.mem_write_ready.value = int(''.join(format(w, '01b') for w in mem_write_ready), 2)
+            while self.pending() & bit:
+                await First(*requests)
+            self.read_ready &= ~bit
+            self.write_ready &= ~bit
+            self.drive()
+
+    def respond(self, c: int):
+        # Each port is one packed vector with a lane per channel, so the lane is sliced out of a single
+        # integer read with the precomputed shifts instead of parsing the binary strings
+        # > Does nothing if the request went away in the meantime (e.g. a reset)
+        bit = 1 << c
+        addr_shift = self.addr_shifts[c]
+        data_shift = self.data_shifts[c]
+
+        if int(self.mem_read_valid.value) & bit:
+            address = (int(self.mem_read_address.value) >> addr_shift) & self.addr_mask
+            self.read_data &= ~(self.data_mask << data_shift)
+            self.read_data |= self.memory[address] << data_shift
+            self.read_ready |= bit
+        elif self.name != "program" and int(self.mem_write_valid.value) & bit:
+            address = (int(self.mem_write_address.value) >> addr_shift) & self.addr_mask
+            self.memory[address] = (int(self.mem_write_data.value) >> data_shift) & self.data_mask
+            self.write_ready |= bit
+        self.drive()
+
+    def drive(self):
+        # The channel tasks share the packed ready/data vectors, so each write drives all lanes from
+        # the Python-side copies
+        self.mem_read_data.value = self.read_data
+        self.mem_read_ready.value = self.read_ready
+        if self.name != "program":
+            self.mem_write_ready.value = self.write_ready
 
     def write(self, address, data):
         if address < len(self.memory):
-            self.memory[address] = data
+            self.memory[address] = data & self.data_mask
 
-    def load(self, rows: List[int]):
-        for address, data in enumerate(rows):
-            self.write(address, data)
+    def load(self, rows: Sequence[int]):
+        # An array with the backing store's typecode (array("B") for data memory) is copied in with a
+        # single slice assignment; any other sequence of ints goes row by row, truncated to the data
+        # width like write()
+        # > Rows past the end of memory are dropped
+        rows = rows[:len(self.memory)]
+        if not (isinstance(rows, array) and rows.typecode == self.memory.typecode):
+            rows = array(self.memory.typecode, [row & self.data_mask for row in rows])
+        self.memory[:len(rows)] = rows
 
     def display(self, rows, decimal=True):
         logger.info("\n")
@@ -96,4 +139,4 @@ class Memory:
                     data_bin = format(data, f'0{16}b')
                     row = f"| {i:<4} | {data_bin} |"
                     logger.info(row + " " * (table_size - len(row) - 1) + "|")
-        logger.info("+" + "-" * (table_size - 3) + "+")
\ No newline at end of file
+        logger.info("+" + "-" * (table_size - 3) + "+")
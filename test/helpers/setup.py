@@ -1,19 +1,40 @@
-from typing import List
+import struct
+from typing import Sequence
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import RisingEdge
+from cocotb.triggers import ClockCycles, First, RisingEdge, Timer
+from cocotb.utils import get_sim_time
 from .memory import Memory
 
+CLOCK_PERIOD = 25
+CLOCK_UNIT = "us"
+
+NUM_CORES = 2
+
+# core_block_id packs one 8-bit block id per core, core 0 in the low byte
+# > Unpacking the little-endian bytes splits out every core's id in one C call
+_block_ids = struct.Struct(f"<{NUM_CORES}B").unpack
+
+def unpack_block_ids(core_block_id: int) -> tuple:
+    return _block_ids(core_block_id.to_bytes(NUM_CORES, "little"))
+
+def current_cycle() -> int:
+    # Derived from simulation time so nothing has to count edges in Python
+    return int(get_sim_time(CLOCK_UNIT) // CLOCK_PERIOD)
+
 async def setup(
     dut, 
     program_memory: Memory, 
-    program: List[int],
+    program: Sequence[int],
     data_memory: Memory,
-    data: List[int],
-    threads: int
+    data: Sequence[int],
+    threads: int,
+    start: bool = True
 ):
+    # start=False only brings the GPU up with its memories loaded, for tests that launch every
+    # run themselves with reset_and_start
     # Setup Clock
-    clock = Clock(dut.clk, 25, unit="us")
+    clock = Clock(dut.clk, CLOCK_PERIOD, unit=CLOCK_UNIT)
     cocotb.start_soon(clock.start())
 
     # Reset
@@ -34,4 +55,55 @@ async def setup(
     dut.device_control_write_enable.value = 0
 
     # Start
+    if start:
+        dut.start.value = 1
+
+# Reliably restarts the GPU on memories that are already loaded
+# > settle is the number of idle cycles between writing the thread count and asserting start,
+#   awaited as a single trigger
+async def reset_and_start(dut, threads: int, settle: int = 1):
+    # 1. Hard Reset (Clears 'done' and internal state)
+    dut.start.value = 0
+    dut.reset.value = 1
+    await RisingEdge(dut.clk)
+    dut.reset.value = 0
+    await RisingEdge(dut.clk)
+    
+    # 2. Set Thread Count
+    dut.device_control_write_enable.value = 1
+    dut.device_control_data.value = threads
+    await RisingEdge(dut.clk)
+    dut.device_control_write_enable.value = 0
+    await ClockCycles(dut.clk, settle)
+    
+    # 3. Pulse Start
     dut.start.value = 1
+    await RisingEdge(dut.clk)
+    dut.start.value = 0
+
+async def wait_for_done(dut, timeout: int) -> int:
+    # Only wakes Python once, when done rises (or the timeout expires)
+    # > Memories have to be serviced from a forked task while waiting (see Memory.driver)
+    # > Returns the number of cycles waited, raises TimeoutError if done never rose
+    start = current_cycle()
+    expired = Timer(timeout * CLOCK_PERIOD, CLOCK_UNIT)
+    if await First(RisingEdge(dut.done), expired) is expired:
+        raise TimeoutError(f"Timeout waiting for done (>{timeout} cycles)")
+    return current_cycle() - start
+
+async def run_until_done(
+    dut,
+    program_memory: Memory,
+    data_memory: Memory,
+    timeout: int,
+    latency: int = 1
+) -> int:
+    # Services both memories while waiting for done, data memory answering after `latency` cycles
+    # > The drivers are cancelled however the wait ends
+    program_task = cocotb.start_soon(program_memory.driver(dut.clk))
+    data_task = cocotb.start_soon(data_memory.driver(dut.clk, latency=latency))
+    try:
+        return await wait_for_done(dut, timeout)
+    finally:
+        program_task.cancel()
+        data_task.cancel()
@@ -0,0 +1,130 @@
+from array import array
+
+# Kernel bitstreams shared by the tests.
+# > Kept as module-level tuples so the literals are built once at import time and can't be
+#   mutated by a test (Memory.load copies them into its own backing store)
+
+MATADD_1x8 = (
+    0b0101000011011110, # MUL R0, %blockIdx, %blockDim
+    0b0011000000001111, # ADD R0, R0, %threadIdx         ; i = blockIdx * blockDim + threadIdx
+    0b1001000100000000, # CONST R1, #0                   ; baseA (matrix A base address)
+    0b1001001000001000, # CONST R2, #8                   ; baseB (matrix B base address)
+    0b1001001100010000, # CONST R3, #16                  ; baseC (matrix C base address)
+    0b0011010000010000, # ADD R4, R1, R0                 ; addr(A[i]) = baseA + i
+    0b0111010001000000, # LDR R4, R4                     ; load A[i] from global memory
+    0b0011010100100000, # ADD R5, R2, R0                 ; addr(B[i]) = baseB + i
+    0b0111010101010000, # LDR R5, R5                     ; load B[i] from global memory
+    0b0011011001000101, # ADD R6, R4, R5                 ; C[i] = A[i] + B[i]
+    0b0011011100110000, # ADD R7, R3, R0                 ; addr(C[i]) = baseC + i
+    0b1000000001110110, # STR R7, R6                     ; store C[i] in global memory
+    0b1111000000000000, # RET                            ; end of kernel
+)
+
+# Matmul kernels
+# > Registers are cleared whenever the dispatcher resets a core for a new block, so R3 (baseA = 0),
+#   R8 (acc = 0) and R9 (k = 0) start at zero without spending a CONST on them
+# > LOOP starts at instruction 9
+
+# A at 0, B at 16, C at 32
+MATMUL_4x4 = (
+    0b0101000011011110, # MUL R0, %blockIdx, %blockDim
+    0b0011000000001111, # ADD R0, R0, %threadIdx         ; i = blockIdx * blockDim + threadIdx
+    0b1001000100000001, # CONST R1, #1                   ; increment
+    0b1001001000000100, # CONST R2, #4                   ; N (matrix inner dimension)
+    0b1001010000010000, # CONST R4, #16                  ; baseB (matrix B base address)
+    0b1001010100100000, # CONST R5, #32                  ; baseC (matrix C base address)
+    0b0110011000000010, # DIV R6, R0, R2                 ; row = i // N
+    0b0101011101100010, # MUL R7, R6, R2
+    0b0100011100000111, # SUB R7, R0, R7                 ; col = i % N
+    0b0101101001100010, # MUL R10, R6, R2                ; LOOP:
+    0b0011101010101001, # ADD R10, R10, R9
+    0b0011101010100011, # ADD R10, R10, R3               ; addr(A[i]) = row * N + k + baseA
+    0b0111101010100000, # LDR R10, R10                   ; load A[i] from global memory
+    0b0101101110010010, # MUL R11, R9, R2
+    0b0011101110110111, # ADD R11, R11, R7
+    0b0011101110110100, # ADD R11, R11, R4               ; addr(B[i]) = k * N + col + baseB
+    0b0111101110110000, # LDR R11, R11                   ; load B[i] from global memory
+    0b0101110010101011, # MUL R12, R10, R11
+    0b0011100010001100, # ADD R8, R8, R12                ; acc = acc + A[i] * B[i]
+    0b0011100110010001, # ADD R9, R9, R1                 ; increment k
+    0b0010000010010010, # CMP R9, R2
+    0b0001100000001001, # BRn LOOP                       ; loop while k < N
+    0b0011100101010000, # ADD R9, R5, R0                 ; addr(C[i]) = baseC + i
+    0b1000000010011000, # STR R9, R8                     ; store C[i] in global memory
+    0b1111000000000000, # RET                            ; end of kernel
+)
+
+MATMUL_4x4_A = (
+    1,2,3,4,
+    5,6,7,8,
+    9,10,11,12,
+    13,14,15,16
+)
+MATMUL_4x4_B = (
+    1,0,0,0,
+    0,1,0,0,
+    0,0,1,0,
+    0,0,0,1
+)
+MATMUL_4x4_DATA = array("B", MATMUL_4x4_A + MATMUL_4x4_B)  # C written at baseC=32
+
+# A at 0, B at 4, C at 8
+MATMUL_2x2 = (
+    0b0101000011011110, # MUL R0, %blockIdx, %blockDim
+    0b0011000000001111, # ADD R0, R0, %threadIdx         ; i = blockIdx * blockDim + threadIdx
+    0b1001000100000001, # CONST R1, #1                   ; increment
+    0b1001001000000010, # CONST R2, #2                   ; N (matrix inner dimension)
+    0b1001010000000100, # CONST R4, #4                   ; baseB (matrix B base address)
+    0b1001010100001000, # CONST R5, #8                   ; baseC (matrix C base address)
+    0b0110011000000010, # DIV R6, R0, R2                 ; row = i // N
+    0b0101011101100010, # MUL R7, R6, R2
+    0b0100011100000111, # SUB R7, R0, R7                 ; col = i % N
+    0b0101101001100010, # MUL R10, R6, R2                ; LOOP:
+    0b0011101010101001, # ADD R10, R10, R9
+    0b0011101010100011, # ADD R10, R10, R3               ; addr(A[i]) = row * N + k + baseA
+    0b0111101010100000, # LDR R10, R10                   ; load A[i] (potential stall)
+    0b0101101110010010, # MUL R11, R9, R2
+    0b0011101110110111, # ADD R11, R11, R7
+    0b0011101110110100, # ADD R11, R11, R4               ; addr(B[i]) = k * N + col + baseB
+    0b0111101110110000, # LDR R11, R11                   ; load B[i] (potential stall)
+    0b0101110010101011, # MUL R12, R10, R11
+    0b0011100010001100, # ADD R8, R8, R12                ; acc = acc + A[i] * B[i]
+    0b0011100110010001, # ADD R9, R9, R1                 ; increment k
+    0b0010000010010010, # CMP R9, R2
+    0b0001100000001001, # BRn LOOP                       ; loop while k < N
+    0b0011100101010000, # ADD R9, R5, R0                 ; addr(C[i]) = baseC + i
+    0b1000000010011000, # STR R9, R8                     ; store C[i] in global memory
+    0b1111000000000000, # RET                            ; end of kernel
+)
+
+# Block 0 stalls on a LOAD while Block 1 does math (latency hiding)
+PRIORITY = (
+    0b0101000011011110, # MUL R0, %blockIdx, %blockDim
+    0b1001000100000000, # CONST R1, #0
+    0b0010000010000001, # CMP R0, R1                     ; compare block_start vs 0
+    0b0001001000000000, # BRp #0                         ; block 1 -> MATH_WORK
+    0b1001001000000000, # CONST R2, #0                   ; BLOCK 0 (memory heavy): addr 0
+    0b0111001100100000, # LDR R3, R2                     ; request memory -> WAIT
+    0b1111000000000000, # RET
+    0b0011000100010001, # ADD R1, R1, R1                 ; BLOCK 1 (compute heavy): dummy math
+    0b0011000100010001, # ADD R1, R1, R1
+    0b0011000100010001, # ADD R1, R1, R1
+    0b0011000100010001, # ADD R1, R1, R1
+    0b1111000000000000, # RET
+)
+
+# Same split as PRIORITY, branching with BRp #2 (used by the parallel and side-by-side tests)
+SIDEBYSIDE = (
+    0b0101000011011110, # MUL R0, %blockIdx, %blockDim
+    0b1001000100000000, # CONST R1, #0
+    0b0010000010000001, # CMP R0, R1
+    0b0001001000000010, # BRp #2                         ; block 1 -> MATH_WORK
+    0b1001001000000000, # CONST R2, #0                   ; PATH A: memory stall (block 0)
+    0b0111001100100000, # LDR R3, R2                     ; stalls here
+    0b1111000000000000, # RET
+    0b0011000100010001, # ADD R1, R1, R1                 ; PATH B: math work (block 1)
+    0b0011000100010001, # ADD R1, R1, R1
+    0b0011000100010001, # ADD R1, R1, R1
+    0b0011000100010001, # ADD R1, R1, R1
+    0b1111000000000000, # RET
+)
@@ -1,22 +1,9 @@
 import cocotb
-from cocotb.triggers import RisingEdge
-from .helpers.setup import setup
+from cocotb.triggers import First, ReadOnly, ValueChange
+from .helpers.setup import setup, current_cycle, run_until_done, unpack_block_ids
 from .helpers.memory import Memory
 from .helpers.logger import logger
-
-def safe_bits(sig) -> str:
-    s = str(sig.value)  # may contain X/Z
-    return s.replace("x","0").replace("X","0").replace("z","0").replace("Z","0")
-
-def safe_int(sig) -> int:
-    return int(safe_bits(sig), 2)
-
-def get_packed_field(sig, idx: int, width: int, n: int, lsb_first=True) -> int:
-    val = safe_int(sig)
-    if lsb_first:
-        return (val >> (idx * width)) & ((1 << width) - 1)
-    shift = (n - 1 - idx) * width
-    return (val >> shift) & ((1 << width) - 1)
+from .programs import MATMUL_4x4, MATMUL_4x4_DATA
 
 @cocotb.test()
 async def test_block_order_trace(dut):
@@ -24,53 +11,12 @@ async def test_block_order_trace(dut):
     program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
 
     # 4x4 matmul program (same one you've been using)
-    program = [
-        0b0101000011011110, # MUL R0, %blockIdx, %blockDim
-        0b0011000000001111, # ADD R0, R0, %threadIdx
-        0b1001000100000001, # CONST R1, #1
-        0b1001001000000100, # CONST R2, #4
-        0b1001001100000000, # CONST R3, #0
-        0b1001010000010000, # CONST R4, #16  baseB
-        0b1001010100100000, # CONST R5, #32  baseC
-        0b0110011000000010, # DIV R6, R0, R2
-        0b0101011101100010, # MUL R7, R6, R2
-        0b0100011100000111, # SUB R7, R0, R7
-        0b1001100000000000, # CONST R8, #0
-        0b1001100100000000, # CONST R9, #0
-        0b0101101001100010,
-        0b0011101010101001,
-        0b0011101010100011,
-        0b0111101010100000,
-        0b0101101110010010,
-        0b0011101110110111,
-        0b0011101110110100,
-        0b0111101110110000,
-        0b0101110010101011,
-        0b0011100010001100,
-        0b0011100110010001,
-        0b0010000010010010,
-        0b0001100000001100,
-        0b0011100101010000,
-        0b1000000010011000,
-        0b1111000000000000
-    ]
+    program = MATMUL_4x4
 
     # Data Memory
     data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
 
-    A = [
-        1,2,3,4,
-        5,6,7,8,
-        9,10,11,12,
-        13,14,15,16
-    ]
-    B = [
-        1,0,0,0,
-        0,1,0,0,
-        0,0,1,0,
-        0,0,0,1
-    ]
-    data = A + B  # C written at baseC=32
+    data = MATMUL_4x4_DATA
 
     # Use more blocks so ordering is obvious:
     # TPB=4 => threads=32 gives 8 blocks (0..7)
@@ -78,44 +24,67 @@ async def test_block_order_trace(dut):
 
     await setup(dut, program_memory, program, data_memory, data, threads)
 
-    NUM_CORES = 2
     TIMEOUT = 200000
 
-    prev_start = 0
-    prev_done = 0
-
     dispatch_events = []
     done_events = []
 
-    cycles = 0
-    while int(dut.done.value) != 1:
-        data_memory.run()
-        program_memory.run()
-
-        start_vec = safe_int(dut.core_start)
-        done_vec  = safe_int(dut.core_done)
-
-        start_rise = start_vec & (~prev_start)
-        done_rise  = done_vec  & (~prev_done)
-
-        for c in range(NUM_CORES):
-            if (start_rise >> c) & 1:
-                bid = get_packed_field(dut.core_block_id, c, width=8, n=NUM_CORES, lsb_first=True)
+    start_cycle = current_cycle()
+
+    # Only wakes when a core starts or finishes a block, instead of sampling every cycle
+    async def sampler():
+        # Resolve the handles and triggers once, not on every wake-up
+        core_start = dut.core_start
+        core_done = dut.core_done
+        core_block_id = dut.core_block_id
+        start_changed = ValueChange(core_start)
+        done_changed = ValueChange(core_done)
+
+        prev_start = 0
+        prev_done = 0
+        while True:
+            await First(start_changed, done_changed)
+
+            # Sample all core signals together once they've settled
+            await ReadOnly()
+            start_vec = int(core_start.value)
+            done_vec  = int(core_done.value)
+            block_ids = unpack_block_ids(int(core_block_id.value))
+            cycles = current_cycle() - start_cycle
+
+            start_rise = start_vec & (~prev_start)
+            done_rise  = done_vec  & (~prev_done)
+
+            # Visit only the cores whose bit rose (lowest set bit first)
+            while start_rise:
+                c = (start_rise & -start_rise).bit_length() - 1
+                start_rise &= start_rise - 1
+                bid = block_ids[c]
                 dispatch_events.append((cycles, c, bid))
-                logger.info(f"[cycle {cycles}] core{c} START block {bid}")
 
-            if (done_rise >> c) & 1:
-                bid = get_packed_field(dut.core_block_id, c, width=8, n=NUM_CORES, lsb_first=True)
+            while done_rise:
+                c = (done_rise & -done_rise).bit_length() - 1
+                done_rise &= done_rise - 1
+                bid = block_ids[c]
                 done_events.append((cycles, c, bid))
-                logger.info(f"[cycle {cycles}] core{c} DONE  block {bid}")
 
-        prev_start = start_vec
-        prev_done = done_vec
+            prev_start = start_vec
+            prev_done = done_vec
+
+    sampler_task = cocotb.start_soon(sampler())
+
+    try:
+        cycles = await run_until_done(dut, program_memory, data_memory, TIMEOUT)
+    finally:
+        sampler_task.cancel()
 
-        await RisingEdge(dut.clk)
-        cycles += 1
-        if cycles > TIMEOUT:
-            assert False, f"Timeout waiting for done (>{TIMEOUT} cycles)"
+        # The trace is written in one batch once the run is over (even a timed out one), so the
+        # sampler never formats or does I/O
+        events = [(t, c, "START", b) for (t, c, b) in dispatch_events]
+        events += [(t, c, "DONE ", b) for (t, c, b) in done_events]
+        events.sort(key=lambda e: e[0])
+        if events:
+            logger.info("\n".join(f"[cycle {t}] core{c} {kind} block {b}" for (t, c, kind, b) in events))
 
     dispatch_order = [b for (_, _, b) in dispatch_events]
     done_order = [b for (_, _, b) in done_events]
@@ -1,36 +1,24 @@
+from array import array
 import cocotb
 from cocotb.triggers import RisingEdge
-from .helpers.setup import setup
+from .helpers.setup import setup, run_until_done
 from .helpers.memory import Memory
 from .helpers.format import format_cycle
 from .helpers.logger import logger
+from .programs import MATADD_1x8
 
 @cocotb.test()
 async def test_matadd(dut):
     # Program Memory
     program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
-    program = [
-        0b0101000011011110, # MUL R0, %blockIdx, %blockDim
-        0b0011000000001111, # ADD R0, R0, %threadIdx         ; i = blockIdx * blockDim + threadIdx
-        0b1001000100000000, # CONST R1, #0                   ; baseA (matrix A base address)
-        0b1001001000001000, # CONST R2, #8                   ; baseB (matrix B base address)
-        0b1001001100010000, # CONST R3, #16                  ; baseC (matrix C base address)
-        0b0011010000010000, # ADD R4, R1, R0                 ; addr(A[i]) = baseA + i
-        0b0111010001000000, # LDR R4, R4                     ; load A[i] from global memory
-        0b0011010100100000, # ADD R5, R2, R0                 ; addr(B[i]) = baseB + i
-        0b0111010101010000, # LDR R5, R5                     ; load B[i] from global memory
-        0b0011011001000101, # ADD R6, R4, R5                 ; C[i] = A[i] + B[i]
-        0b0011011100110000, # ADD R7, R3, R0                 ; addr(C[i]) = baseC + i
-        0b1000000001110110, # STR R7, R6                     ; store C[i] in global memory
-        0b1111000000000000, # RET                            ; end of kernel
-    ]
+    program = MATADD_1x8
 
     # Data Memory
     data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
-    data = [
+    data = array("B", [
         0, 1, 2, 3, 4, 5, 6, 7, # Matrix A (1 x 8)
         0, 1, 2, 3, 4, 5, 6, 7  # Matrix B (1 x 8)
-    ]
+    ])
 
     # Device Control
     threads = 8
@@ -46,16 +34,24 @@ async def test_matadd(dut):
 
     data_memory.display(24)
 
-    cycles = 0
-    while dut.done.value != 1:
-        data_memory.run()
-        program_memory.run()
+    TIMEOUT = 10000
 
-        await cocotb.triggers.ReadOnly()
-        format_cycle(dut, cycles)
-        
-        await RisingEdge(dut.clk)
-        cycles += 1
+    async def tracer():
+        rising_clk = RisingEdge(dut.clk)
+
+        cycles = 0
+        while True:
+            await cocotb.triggers.ReadOnly()
+            format_cycle(dut, cycles)
+            
+            await rising_clk
+            cycles += 1
+
+    tracer_task = cocotb.start_soon(tracer())
+    try:
+        cycles = await run_until_done(dut, program_memory, data_memory, TIMEOUT)
+    finally:
+        tracer_task.cancel()
 
     logger.info(f"Completed in {cycles} cycles")
     data_memory.display(24)
@@ -1,117 +1,71 @@
 import cocotb
 from cocotb.triggers import RisingEdge
-from .helpers.setup import setup
+from .helpers.setup import setup, run_until_done, NUM_CORES, unpack_block_ids
 from .helpers.memory import Memory
 from .helpers.logger import logger
+from .programs import MATMUL_4x4, MATMUL_4x4_A, MATMUL_4x4_DATA
 
 @cocotb.test()
 async def test_matmul_4x4_with_block_timing(dut):
     program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
 
-    program = [
-        0b0101000011011110, # MUL R0, %blockIdx, %blockDim
-        0b0011000000001111, # ADD R0, R0, %threadIdx
-        0b1001000100000001, # CONST R1, #1
-        0b1001001000000100, # CONST R2, #4   (make sure encoding is correct)
-        0b1001001100000000, # CONST R3, #0
-        0b1001010000010000, # CONST R4, #16  baseB
-        0b1001010100100000, # CONST R5, #32  baseC
-        0b0110011000000010, # DIV R6, R0, R2
-        0b0101011101100010, # MUL R7, R6, R2
-        0b0100011100000111, # SUB R7, R0, R7
-        0b1001100000000000, # CONST R8, #0
-        0b1001100100000000, # CONST R9, #0
-        0b0101101001100010,
-        0b0011101010101001,
-        0b0011101010100011,
-        0b0111101010100000,
-        0b0101101110010010,
-        0b0011101110110111,
-        0b0011101110110100,
-        0b0111101110110000,
-        0b0101110010101011,
-        0b0011100010001100,
-        0b0011100110010001,
-        0b0010000010010010,
-        0b0001100000001100,
-        0b0011100101010000,
-        0b1000000010011000,
-        0b1111000000000000
-    ]
+    program = MATMUL_4x4
 
     data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
 
-    A = [
-        1,2,3,4,
-        5,6,7,8,
-        9,10,11,12,
-        13,14,15,16
-    ]
-    B = [
-        1,0,0,0,
-        0,1,0,0,
-        0,0,1,0,
-        0,0,0,1
-    ]
-    data = A + B  # C written at baseC=32
+    data = MATMUL_4x4_DATA
 
     threads = 16
     await setup(dut, program_memory, program, data_memory, data, threads)
 
-    NUM_CORES = 2  # change if your design differs
-
     seen_start = set()
     finish_cycle = {}     # block_id -> cycle
     start_cycle = {}      # block_id -> first cycle observed started (optional)
+    trace = []            # (cycle, core, event, block_id), logged in one batch after the run
 
-    cycles = 0
     TIMEOUT = 50000
-    def safe_bits(sig) -> str:
-        s = str(sig.value)  # e.g. "01X0" or "0000000100000010..."
-        return s.replace("x","0").replace("X","0").replace("z","0").replace("Z","0")
 
-    def safe_int(sig) -> int:
-        return int(safe_bits(sig), 2)
+    async def sampler():
+        core_start = dut.core_start
+        core_done = dut.core_done
+        core_block_id = dut.core_block_id
+        rising_clk = RisingEdge(dut.clk)
+
+        cycles = 0
+        while True:
+            core_start_vec = int(core_start.value)
+            core_done_vec  = int(core_done.value)
 
-    def get_packed_field(sig, idx: int, width: int, n: int, lsb_first=True) -> int:
-        bits = safe_bits(sig)
-        # bits is MSB->LSB as a string
-        # Convert to int then shift/mask with assumed packing
-        val = int(bits, 2)
 
-        if lsb_first:
-            return (val >> (idx * width)) & ((1 << width) - 1)
-        else:
-            # MSB-first chunking
-            shift = (n - 1 - idx) * width
-            return (val >> shift) & ((1 << width) - 1)
+            block_ids = unpack_block_ids(int(core_block_id.value))
 
-    while int(dut.done.value) != 1:
-        data_memory.run()
-        program_memory.run()
+            for c in range(NUM_CORES):
+                if ((core_start_vec >> c) & 1) == 1:
+                    bid = block_ids[c]
+                    if bid not in start_cycle:
+                        start_cycle[bid] = cycles
+                    trace.append((cycles, c, "START", bid))
 
-        core_start_vec = safe_int(dut.core_start)
-        core_done_vec  = safe_int(dut.core_done)
+                if ((core_done_vec >> c) & 1) == 1:
+                    bid = block_ids[c]
+                    if bid not in finish_cycle:
+                        finish_cycle[bid] = cycles
+                        trace.append((cycles, c, "DONE ", bid))
 
 
-        for c in range(NUM_CORES):
-            if ((core_start_vec >> c) & 1) == 1:
-                bid = get_packed_field(dut.core_block_id, c, width=8, n=NUM_CORES, lsb_first=True)
-                if bid not in start_cycle:
-                    start_cycle[bid] = cycles
-                logger.info(f"[cycle {cycles}] core{c} START block {bid}")
+            await rising_clk
+            cycles += 1
 
-            if ((core_done_vec >> c) & 1) == 1:
-                bid = get_packed_field(dut.core_block_id, c, width=8, n=NUM_CORES, lsb_first=True)
-                if bid not in finish_cycle:
-                    finish_cycle[bid] = cycles
-                    logger.info(f"[cycle {cycles}] core{c} DONE  block {bid}")
+    sampler_task = cocotb.start_soon(sampler())
 
+    try:
+        cycles = await run_until_done(dut, program_memory, data_memory, TIMEOUT)
+    finally:
+        sampler_task.cancel()
 
-        await RisingEdge(dut.clk)
-        cycles += 1
-        if cycles > TIMEOUT:
-            assert False, f"Timeout waiting for done (>{TIMEOUT} cycles)"
+        # Written even when the run times out, so there's something to debug the hang with
+        if trace:
+            logger.info("\n".join(f"[cycle {t}] core{c} {kind} block {b}" for (t, c, kind, b) in trace))
 
     logger.info("====================================")
     logger.info(f"TOTAL cycles: {cycles}")
@@ -121,6 +75,6 @@ async def test_matmul_4x4_with_block_timing(dut):
 
     # Correctness check: C should equal A since B is identity
     baseC = 32
-    for i, expected in enumerate(A):
+    for i, expected in enumerate(MATMUL_4x4_A):
         got = data_memory.memory[baseC + i]
         assert got == expected, f"C[{i}] mismatch: expected {expected}, got {got}"
@@ -1,8 +1,9 @@
+from array import array
 import cocotb
-from cocotb.triggers import RisingEdge
-from .helpers.setup import setup
+from .helpers.setup import setup, run_until_done
 from .helpers.memory import Memory
 from .helpers.logger import logger
+from .programs import PRIORITY
 
 @cocotb.test()
 async def test_priority(dut):
@@ -16,30 +17,11 @@ async def test_priority(dut):
     # We use the %blockIdx to give different jobs to Block 0 and Block 1
     # Block 0: Loads from Memory (Slow)
     # Block 1: Does Math (Fast)
-    program = [
-        # 1. Check Block ID. If Block 1, jump to MATH_WORK
-        0b0101000011011110, # MUL R0, %blockIdx, %blockDim
-        0b1001000100000000, # CONST R1, #0
-        0b0010000010000001, # CMP R0, R1 (Compare block_start vs 0)
-        0b0001001000000000, # BRp #2 (Jump to Offset 2 if Positive -> Block 1)
-        
-        # --- BLOCK 0 WORK: MEMORY HEAVY ---
-        0b1001001000000000, # CONST R2, #0 (Addr 0)
-        0b0111001100100000, # LDR R3, R2   (Request Memory -> GO TO WAIT)
-        0b1111000000000000, # RET
-        
-        # --- BLOCK 1 WORK: COMPUTE HEAVY ---
-        # (This executes while Block 0 is waiting!)
-        0b0011000100010001, # ADD R1, R1, R1 (Dummy Math)
-        0b0011000100010001, # ADD R1, R1, R1
-        0b0011000100010001, # ADD R1, R1, R1
-        0b0011000100010001, # ADD R1, R1, R1
-        0b1111000000000000, # RET
-    ]
+    program = PRIORITY
 
     program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
     data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
-    data = [0] * 32 # Dummy data
+    data = array("B", bytes(32)) # Dummy data
 
     # --- RUN 1: SEQUENTIAL BASELINE (4 Threads) ---
     # We run Block 0, then we run Block 1 separately.
@@ -59,16 +41,10 @@ async def test_priority(dut):
     threads = 8
     await setup(dut, program_memory, program, data_memory, data, threads)
 
-    cycles = 0
-    while dut.done.value != 1:
-        # INJECT MASSIVE LATENCY
-        # Make memory take 10 cycles to respond.
-        # This gives Block 1 plenty of time to finish its math while Block 0 waits.
-        if cycles % 10 == 0:
-            data_memory.run()
-        program_memory.run()
-        await RisingEdge(dut.clk)
-        cycles += 1
+    # INJECT MASSIVE LATENCY
+    # Make memory take 10 cycles to respond.
+    # This gives Block 1 plenty of time to finish its math while Block 0 waits.
+    cycles = await run_until_done(dut, program_memory, data_memory, timeout=5000, latency=10)
         
     logger.info(f"Total Cycles with Priority: {cycles}")
     
@@ -1,85 +1,29 @@
+from array import array
 import cocotb
-from cocotb.triggers import RisingEdge
-from .helpers.setup import setup
+from .helpers.setup import setup, reset_and_start, run_until_done
 from .helpers.memory import Memory
 from .helpers.logger import logger
+from .programs import SIDEBYSIDE
 
-async def run_batch_robust(dut, threads, start_index=0):
+async def reload_control(dut, threads):
     """
-    Runs a batch with a hard reset to prevent 'Instant Finish' bugs.
+    Hard reset + thread count + start, without touching the (already loaded) memories.
+    Waits 2 cycles for the thread count to latch before asserting start.
     """
-    
-    # 1. SETUP MEMORY & PROGRAM
-    # Block 0 -> Loads Memory (Stalls)
-    # Block 1 -> Does Math (Runs in background)
-    program = [
-        # Block ID Check: R0 = blockIdx * blockDim
-        0b0101000011011110, # MUL R0, %blockIdx, %blockDim
-        0b1001000100000000, # CONST R1, #0
-        0b0010000010000001, # CMP R0, R1
-        0b0001001000000010, # BRp #2 (Jump to Offset 2 if Positive -> Block 1)
-        
-        # PATH A: MEMORY STALL (Block 0)
-        0b1001001000000000, # CONST R2, #0 
-        0b0111001100100000, # LDR R3, R2 (STALLS HERE)
-        0b1111000000000000, # RET
-        
-        # PATH B: MATH WORK (Block 1)
-        0b0011000100010001, # ADD R1, R1, R1
-        0b0011000100010001, # ADD R1, R1, R1
-        0b0011000100010001, # ADD R1, R1, R1
-        0b0011000100010001, # ADD R1, R1, R1
-        0b1111000000000000, # RET
-    ]
-
-    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
-    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
-    data = [0] * 32 
-
-    # 2. RUN STANDARD SETUP
-    # This might trigger a race condition (Start before ThreadCount is ready).
-    # We allow it to happen, then we fix it below.
-    await setup(dut, program_memory, program, data_memory, data, threads)
-    
-    # --- FIX: FORCE RESET AND RESTART ---
     logger.info(f"   [Batch Start] Resetting GPU to ensure clean state for {threads} threads...")
+    await reset_and_start(dut, threads, settle=2)
+
+async def run_batch_robust(dut, threads, program_memory, data_memory):
+    """
+    Runs a batch with a hard reset to prevent 'Instant Finish' bugs.
+    The memories are shared between batches and only loaded once (see test_comparison_2x4).
+    """
+    await reload_control(dut, threads)
     
-    dut.start.value = 0           
-    dut.reset.value = 1           # Assert Reset
-    await RisingEdge(dut.clk)
-    dut.reset.value = 0           # Release Reset
-    await RisingEdge(dut.clk)
-    
-    # Re-write the thread count explicitly
-    dut.device_control_write_enable.value = 1
-    dut.device_control_data.value = threads
-    await RisingEdge(dut.clk)
-    dut.device_control_write_enable.value = 0
-    
-    # Wait 2 cycles for values to latch
-    await RisingEdge(dut.clk)
-    await RisingEdge(dut.clk)
-    
-    # NOW assert Start
-    dut.start.value = 1
-    await RisingEdge(dut.clk)
-    dut.start.value = 0 
-    
-    # 3. EXECUTION LOOP
-    cycles = 0
-    while dut.done.value != 1:
-        # Inject Latency: Memory responds only every 8 cycles
-        if cycles % 8 == 0:
-            data_memory.run()
-        program_memory.run()
-        
-        await RisingEdge(dut.clk)
-        cycles += 1
-        
-        # Safety Timeout (prevent infinite loops)
-        if cycles > 2000:
-            logger.error("Timeout! GPU stuck in infinite loop.")
-            break
+    # EXECUTION LOOP
+    # Inject Latency: Memory responds 8 cycles after a request
+    # Safety Timeout (prevent infinite loops)
+    cycles = await run_until_done(dut, program_memory, data_memory, timeout=2000, latency=8)
             
     return cycles
 
@@ -92,13 +36,25 @@ async def test_comparison_2x4(dut):
     logger.info(" STARTING SIDE-BY-SIDE PRIORITY TEST")
     logger.info("==================================================")
 
+    # --- SETUP MEMORY & PROGRAM (shared by every batch) ---
+    # Block 0 -> Loads Memory (Stalls)
+    # Block 1 -> Does Math (Runs in background)
+    # The kernel never stores, so the memories don't need reloading between batches.
+    program_memory = Memory(dut=dut, addr_bits=8, data_bits=16, channels=1, name="program")
+    data_memory = Memory(dut=dut, addr_bits=8, data_bits=8, channels=4, name="data")
+    data = array("B", bytes(32))
+
+    # Start is left low here: asserting it straight after the thread count write raced the
+    # DCR, so every batch starts the GPU itself after a hard reset (see reload_control)
+    await setup(dut, program_memory, SIDEBYSIDE, data_memory, data, threads=4, start=False)
+
     # --- SCENARIO 1: SEQUENTIAL ---
     logger.info(">>> SCENARIO 1: Sequential Run (4 threads, reset, 4 threads)")
     
-    c1 = await run_batch_robust(dut, threads=4)
+    c1 = await run_batch_robust(dut, 4, program_memory, data_memory)
     logger.info(f"   Batch 1 finished: {c1} cycles")
 
-    c2 = await run_batch_robust(dut, threads=4)
+    c2 = await run_batch_robust(dut, 4, program_memory, data_memory)
     logger.info(f"   Batch 2 finished: {c2} cycles")
     
     total_seq = c1 + c2
@@ -107,7 +63,7 @@ async def test_comparison_2x4(dut):
     # --- SCENARIO 2: PARALLEL ---
     logger.info(">>> SCENARIO 2: Parallel Run (8 threads at once)")
     
-    total_par = await run_batch_robust(dut, threads=8)
+    total_par = await run_batch_robust(dut, 8, program_memory, data_memory)
     logger.info(f"   >>> TOTAL PARALLEL: {total_par}")
     
     # --- RESULTS ---